@@ -1,6 +1,11 @@
 import streamlit as st
 import pandas as pd
+import base64
 import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 from app.layout import render_header
 from app.parsers import parse_meeting_organizer
@@ -12,6 +17,61 @@ from app.html_renderer import (
     render_request_summary_table
 )
 
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def _cached_run_scheduler(preferences, reps_df, max_meetings_rep, max_peak, max_acc, seeds):
+    """
+    Memoized run_scheduler: re-running with the same upload and settings
+    returns the previous result instead of re-evaluating every seed.
+    """
+    return run_scheduler(
+        preferences,
+        reps_df,
+        max_meetings_rep,
+        max_peak,
+        max_acc,
+        seeds=seeds
+    )
+
+
+# Hidden iframe that loads a base64-encoded HTML document from a blob URL
+# and opens the browser print dialog once it has loaded
+_PRINT_IFRAME_TEMPLATE = """
+<iframe id="{iframe_id}" style="display:none;"></iframe>
+<script>
+    const iframe = document.getElementById("{iframe_id}");
+    const bytes = Uint8Array.from(atob("{b64_html}"), c => c.charCodeAt(0));
+    const blob = new Blob([bytes], {{ type: "text/html;charset=utf-8" }});
+    iframe.onload = () => setTimeout(() => iframe.contentWindow.print(), 300);
+    iframe.src = URL.createObjectURL(blob);
+</script>
+"""
+
+
+def _print_iframe(big_html, iframe_id):
+    """
+    Print a combined HTML document via a hidden iframe. The document is
+    base64-encoded, so it never needs escaping for the JS source.
+    """
+    b64_html = base64.b64encode(big_html.encode("utf-8")).decode()
+    st.components.v1.html(
+        _PRINT_IFRAME_TEMPLATE.format(iframe_id=iframe_id, b64_html=b64_html),
+        height=0
+    )
+
+
+def _render_pages(render, items):
+    """
+    Render one HTML page per item on a small thread pool, keeping input
+    order. Workers share the script run context of the calling rerun.
+    """
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(8, os.cpu_count() or 2),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as ex:
+        return list(ex.map(render, items))
+
+
 def attach_substitutions(supplier_sched, supplier_summary):
     """
     Add a 'substitutions' column to supplier_sched by mapping:
@@ -23,36 +83,28 @@ def attach_substitutions(supplier_sched, supplier_summary):
         for req_name, subs_list in subs.items():
             subs_map[(supp, req_name)] = ", ".join(subs_list)
 
-    supplier_sched = supplier_sched.copy()
-    supplier_sched["substitutions"] = supplier_sched.apply(
-        lambda r: subs_map.get((r["supplier"], r["category"]), ""),
-        axis=1
+    keys = pd.MultiIndex.from_arrays(
+        [supplier_sched["supplier"], supplier_sched["category"]]
     )
-    return supplier_sched
+
+    return supplier_sched.assign(substitutions=keys.map(subs_map).fillna(""))
 
 
-def create_download_workbook(supplier_sched, rep_sched, supplier_summary):
+def create_download_workbook(supplier_sched, rep_sched):
     """
     Build a formatted Excel workbook with:
-    - Suppliers sheet (with substitutions)
+    - Suppliers sheet (supplier_sched already carries substitutions)
     - Representatives sheet
     """
 
     output = io.BytesIO()
 
-    # Merge substitutions into supplier schedule
-    supplier_sched2 = attach_substitutions(supplier_sched, supplier_summary)
-
     with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
 
-        # Write raw sheets
-        supplier_sched2.to_excel(writer, sheet_name="Suppliers", index=False)
-        rep_sched.to_excel(writer, sheet_name="Representatives", index=False)
-
-        # Workbook + worksheets
+        # Workbook + worksheets (every cell is written once, formatted, below)
         wb = writer.book
-        ws_sup = writer.sheets["Suppliers"]
-        ws_rep = writer.sheets["Representatives"]
+        ws_sup = wb.add_worksheet("Suppliers")
+        ws_rep = wb.add_worksheet("Representatives")
 
         # -----------------------------
         # STYLES
@@ -86,66 +138,60 @@ def create_download_workbook(supplier_sched, rep_sched, supplier_summary):
         })
 
         # SUPPLIERS SHEET
-        sup_df = supplier_sched2
+        sup_df = supplier_sched
 
         for col_idx, col_name in enumerate(sup_df.columns):
 
             # Write header
             ws_sup.write(0, col_idx, col_name, header_fmt)
 
-            is_money = col_name in ["total_opportunity", "opportunity"]
+            col = sup_df[col_name]
 
-            for row_idx in range(1, len(sup_df) + 1):
+            # --- Apply formatting ---
+            if col_name in ["total_opportunity", "opportunity"]:
+                col = pd.to_numeric(col, errors="coerce")
+                fmt = money_fmt
+            else:
+                # --- Fix list types ---
+                col = col.map(
+                    lambda v: ", ".join(map(str, v)) if isinstance(v, list) else v
+                )
+                fmt = cell_fmt
 
-                val = sup_df.iloc[row_idx - 1, col_idx]
+            # --- Clean NaN ---
+            col = col.astype(object).where(col.notna(), "")
 
-                # --- Fix list types ---
-                if isinstance(val, list):
-                    val = ", ".join([str(x) for x in val])
-
-                # --- Clean NaN ---
-                if pd.isna(val):
-                    val = ""
-
-                # --- Apply formatting ---
-                if is_money:
-                    try:
-                        ws_sup.write_number(row_idx, col_idx, float(val), money_fmt)
-                    except:
-                        ws_sup.write(row_idx, col_idx, "", money_fmt)
-                else:
-                    ws_sup.write(row_idx, col_idx, val, cell_fmt)
+            ws_sup.write_column(1, col_idx, col.tolist(), fmt)
 
             # Auto width
             max_width = max(
                 len(str(col_name)),
-                sup_df[col_name].astype(str).map(len).max()
+                col.astype(str).str.len().max()
             )
             ws_sup.set_column(col_idx, col_idx, min(max_width + 2, 40))
 
         # REPRESENTATIVES SHEET
         rep_df = rep_sched
 
-        for col_idx, col_name in enumerate(rep_df.columns):
-
-            ws_rep.write(0, col_idx, col_name, header_fmt)
+        ws_rep.write_row(0, 0, list(rep_df.columns), header_fmt)
 
-            for row_idx in range(1, len(rep_df) + 1):
-
-                val = rep_df.iloc[row_idx - 1, col_idx]
-
-                if isinstance(val, list):
-                    val = ", ".join([str(x) for x in val])
+        # --- Fix list types + clean NaN, one pass per column ---
+        rep_clean = {}
+        for col_name in rep_df.columns:
+            col = rep_df[col_name].map(
+                lambda v: ", ".join(map(str, v)) if isinstance(v, list) else v
+            )
+            rep_clean[col_name] = col.astype(object).where(col.notna(), "")
 
-                if pd.isna(val):
-                    val = ""
+        rep_clean = pd.DataFrame(rep_clean)
 
-                ws_rep.write(row_idx, col_idx, val, cell_fmt)
+        for row_idx, row in enumerate(rep_clean.itertuples(index=False, name=None), start=1):
+            ws_rep.write_row(row_idx, 0, row, cell_fmt)
 
-            max_width = max(
-                len(str(col_name)),
-                rep_df[col_name].astype(str).map(len).max()
-            )
+        # Auto width (all columns in one pass)
+        rep_widths = rep_df.astype(str).apply(lambda c: c.str.len().max())
+        for col_idx, (col_name, width) in enumerate(rep_widths.items()):
+            max_width = max(len(str(col_name)), width)
             ws_rep.set_column(col_idx, col_idx, min(max_width + 2, 40))
 
     return output.getvalue()
@@ -230,12 +276,23 @@ def main():
 
     suppliers_df, reps_df, preferences = parse_meeting_organizer(uploaded)
 
+    # Supplier lookups, rebuilt only when a different file is uploaded
+    if st.session_state.get("upload_id") != uploaded.file_id:
+        st.session_state["upload_id"] = uploaded.file_id
+        st.session_state["supplier_list"] = suppliers_df["Supplier"].tolist()
+        st.session_state["booth_map"] = dict(
+            zip(suppliers_df["Supplier"], suppliers_df["Booth"])
+        )
+
+    supplier_list = st.session_state["supplier_list"]
+    booth_map = st.session_state["booth_map"]
+
     # -------------------------------------------------------------------
     # Run scheduler
     # -------------------------------------------------------------------
     if st.button("Run Scheduler"):
         with st.spinner("Generating schedules… this may take a moment."):
-            supplier_sched, rep_sched, supplier_summary, validation = run_scheduler(
+            supplier_sched, rep_sched, supplier_summary, validation = _cached_run_scheduler(
                 preferences,
                 reps_df,
                 max_meetings_rep,
@@ -244,14 +301,27 @@ def main():
                 seeds=25
             )
 
+            # Merge substitutions once so every view/export shares them
+            supplier_sched = attach_substitutions(supplier_sched, supplier_summary)
+
+            # Repeated names as categoricals: per-supplier/rep masks and
+            # groupbys compare integer codes instead of Python strings
+            for col in ("supplier", "rep", "category"):
+                if col in supplier_sched.columns:
+                    supplier_sched[col] = supplier_sched[col].astype("category")
+                if col in rep_sched.columns:
+                    rep_sched[col] = rep_sched[col].astype("category")
+
             st.session_state["supplier_sched"] = supplier_sched
             st.session_state["rep_sched"] = rep_sched
+            st.session_state["meeting_reps"] = sorted(rep_sched["rep"].unique().tolist())
             st.session_state["supplier_summary"] = supplier_summary
             st.session_state["validation"] = validation
+            st.session_state.pop("excel_bytes", None)
 
             # Validate all suppliers present
             missing = [
-                s for s in suppliers_df["Supplier"]
+                s for s in supplier_list
                 if s not in supplier_summary
             ]
 
@@ -283,49 +353,30 @@ def main():
         with col_select:
             selected_supplier = st.selectbox(
                 "Select Supplier",
-                suppliers_df["Supplier"].tolist(),
+                supplier_list,
                 key="supplier_select"
             )
 
         with col_btn:
             if st.button("Save ALL Supplier Schedules (PDF)"):
 
-                pages = []
-                for supp in suppliers_df["Supplier"]:
-                    booth_s = suppliers_df.loc[
-                        suppliers_df["Supplier"] == supp,
-                        "Booth"
-                    ].iloc[0]
-
-                    df_s = supplier_sched[supplier_sched["supplier"] == supp]
-                    summary_s = supplier_summary.get(supp, {})
-
-                    pages.append(
-                        render_supplier_html(supp, booth_s, df_s, summary_s, reps_df)
-                    )
-
-                big_html = build_combined_html(pages)
-
-                st.components.v1.html(
-                    f"""
-                    <iframe id="print_all_suppliers" style="display:none;"></iframe>
-                    <script>
-                        const iframe = document.getElementById("print_all_suppliers");
-                        const doc = iframe.contentWindow.document;
-                        doc.open();
-                        doc.write(`{big_html.replace("`", "\\`")}`);
-                        doc.close();
-                        setTimeout(() => iframe.contentWindow.print(), 300);
-                    </script>
-                    """,
-                    height=0
+                sup_groups = dict(tuple(supplier_sched.groupby("supplier", sort=False, observed=True)))
+
+                pages = _render_pages(
+                    lambda supp: render_supplier_html(
+                        supp,
+                        booth_map[supp],
+                        sup_groups.get(supp, supplier_sched.iloc[:0]),
+                        supplier_summary.get(supp, {}),
+                        reps_df
+                    ),
+                    supplier_list
                 )
 
+                _print_iframe(build_combined_html(pages), "print_all_suppliers")
+
         # Render selected supplier
-        booth_val = suppliers_df.loc[
-            suppliers_df["Supplier"] == selected_supplier,
-            "Booth"
-        ].iloc[0]
+        booth_val = booth_map[selected_supplier]
 
         df_supplier = supplier_sched[supplier_sched["supplier"] == selected_supplier]
         html_supplier = render_supplier_html(
@@ -349,7 +400,19 @@ def main():
     # ============================================================
     with tab_reps:
 
-        meeting_reps = sorted(rep_sched["rep"].unique().tolist())
+        meeting_reps = st.session_state["meeting_reps"]
+
+        # Row lookups shared by every render_rep_html call
+        rep_info_map = (
+            reps_df.drop_duplicates("Rep Name")
+            .set_index("Rep Name")
+            .to_dict(orient="index")
+        )
+        supp_info_map = (
+            suppliers_df.drop_duplicates("Supplier")
+            .set_index("Supplier")
+            .to_dict(orient="index")
+        )
 
         col_select, spacer, col_btn = st.columns([2, 2, 1])
 
@@ -363,32 +426,27 @@ def main():
         with col_btn:
             if st.button("Save ALL Rep Schedules (PDF)"):
 
-                pages = []
-                for rep in meeting_reps:
-                    df_rep = rep_sched[rep_sched["rep"] == rep]
-                    pages.append(
-                        render_rep_html(rep, df_rep, suppliers_df, reps_df)
-                    )
-
-                big_html = build_combined_html(pages)
-
-                st.components.v1.html(
-                    f"""
-                    <iframe id="print_all_reps" style="display:none;"></iframe>
-                    <script>
-                        const iframe = document.getElementById("print_all_reps");
-                        const doc = iframe.contentWindow.document;
-                        doc.open();
-                        doc.write(`{big_html.replace("`", "\\`")}`);
-                        doc.close();
-                        setTimeout(() => iframe.contentWindow.print(), 300);
-                    </script>
-                    """,
-                    height=0
+                rep_groups = dict(tuple(rep_sched.groupby("rep", sort=False, observed=True)))
+
+                pages = _render_pages(
+                    lambda rep: render_rep_html(
+                        rep,
+                        rep_groups[rep],
+                        rep_info_map.get(rep, {}),
+                        supp_info_map
+                    ),
+                    meeting_reps
                 )
 
+                _print_iframe(build_combined_html(pages), "print_all_reps")
+
         df_rep_selected = rep_sched[rep_sched["rep"] == selected_rep]
-        html_rep = render_rep_html(selected_rep, df_rep_selected, suppliers_df, reps_df)
+        html_rep = render_rep_html(
+            selected_rep,
+            df_rep_selected,
+            rep_info_map.get(selected_rep, {}),
+            supp_info_map
+        )
         st.components.v1.html(html_rep, height=1100, scrolling=True)
     
     # ============================================================
@@ -403,19 +461,21 @@ def main():
         - **Representatives**: the full sales rep meeting schedule  
         """)
 
-        # Build Excel when requested
-        excel_bytes = create_download_workbook(
-            supplier_sched,
-            rep_sched,
-            supplier_summary
-        )
+        # Build Excel when requested (cleared whenever a new schedule is run)
+        if st.button("Generate Excel"):
+            with st.spinner("Building workbook…"):
+                st.session_state["excel_bytes"] = create_download_workbook(
+                    supplier_sched,
+                    rep_sched
+                )
 
-        st.download_button(
-            label="Download Scheduler Output (Excel)",
-            data=excel_bytes,
-            file_name="SGF_Schedule_Output.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        if "excel_bytes" in st.session_state:
+            st.download_button(
+                label="Download Scheduler Output (Excel)",
+                data=st.session_state["excel_bytes"],
+                file_name="SGF_Schedule_Output.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
 
 
 
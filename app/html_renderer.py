@@ -1,4 +1,6 @@
+import streamlit as st
 from app.utils import time_slots
+from itertools import chain
 import pandas as pd
 
 # =====================================================================
@@ -11,6 +13,18 @@ def _format_millions(x):
         return "-"
     return f"${x/1_000_000:,.1f}M"
 
+def _frame_key(df):
+    """
+    Cache key for DataFrame arguments. List cells (e.g. "reps") are
+    stringified so pandas' vectorized row hashing can be used instead of
+    Streamlit falling back to pickling the whole frame.
+    """
+    df = df.apply(
+        lambda c: c.map(lambda v: str(v) if isinstance(v, list) else v)
+        if c.dtype == object else c
+    )
+    return tuple(df.columns), pd.util.hash_pandas_object(df).values.tobytes()
+
 def _build_single_day_rows(day_name, data_map, *, mode):
     """
     mode = "supplier" → columns: Time | Request | Appointment With | Opp. $
@@ -212,8 +226,12 @@ td {
 # =====================================================================
 #   SUPPLIER HTML
 # =====================================================================
+@st.cache_data(ttl=3600, show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
 def render_supplier_html(supplier_name, booth, schedule_df, supplier_summary, reps_df):
 
+    # Materialize the rows once; both passes below read them
+    records = schedule_df.to_dict("records")
+
     # ===============================================================
     # BUILD DAY TABLE MAPPING
     # ===============================================================
@@ -223,7 +241,7 @@ def render_supplier_html(supplier_name, booth, schedule_df, supplier_summary, re
             "category": r["category"],
             "opportunity": r.get("total_opportunity", "")
         }
-        for _, r in schedule_df.iterrows()
+        for r in records
     }
 
     days = list(time_slots.keys())
@@ -247,7 +265,7 @@ def render_supplier_html(supplier_name, booth, schedule_df, supplier_summary, re
         """)
 
     all_reps = []
-    for _, r in schedule_df.iterrows():
+    for r in records:
         reps = r["reps"]
         if isinstance(reps, list):
             all_reps.extend(reps)
@@ -356,6 +374,7 @@ def render_supplier_html(supplier_name, booth, schedule_df, supplier_summary, re
     </html>
     """
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def render_request_summary_table(supplier_summary):
     requested = supplier_summary.get("requested", [])
     fulfilled = set(supplier_summary.get("fulfilled", []))
@@ -428,21 +447,24 @@ def render_request_summary_table(supplier_summary):
 # =====================================================================
 #   REP HTML
 # =====================================================================
-def render_rep_html(rep_name, schedule_df, suppliers_df, reps_df):
+@st.cache_data(ttl=3600, show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
+def render_rep_html(rep_name, schedule_df, rep_info, supp_info_map):
+    """
+    rep_info      → this rep's row from reps_df as a dict
+    supp_info_map → Supplier → row dict from suppliers_df
+    """
 
-    rep_email = reps_df.loc[
-        reps_df["Rep Name"] == rep_name, "Email"
-    ].fillna("").iloc[0]
+    rep_email = rep_info.get("Email", "")
+    if pd.isna(rep_email):
+        rep_email = ""
 
     data_map = {}
-    for _, r in schedule_df.iterrows():
+    for r in schedule_df.to_dict("records"):
         supplier = r.get("supplier")
         if supplier is None:
             data_map[(r["day"], r["timeslot"])] = None
         else:
-            booth = suppliers_df.loc[
-                suppliers_df["Supplier"] == supplier, "Booth"
-            ].iloc[0]
+            booth = supp_info_map.get(supplier, {}).get("Booth", "")
             data_map[(r["day"], r["timeslot"])] = {
                 "supplier": supplier,
                 "booth": booth,
@@ -513,6 +535,7 @@ def render_rep_html(rep_name, schedule_df, suppliers_df, reps_df):
 # =====================================================================
 import base64
 
+@st.cache_resource
 def load_logo_base64(path):
     with open(path, "rb") as f:
         return base64.b64encode(f.read()).decode("utf-8")
@@ -610,10 +633,14 @@ def render_intro_page(logo_b64: str):
 def build_combined_html(html_pages, logo_path="files/logos.png"):
     """
     Inserts an intro page as the first sheet, then all schedule pages.
+    html_pages may be any iterable (e.g. a generator); pages are consumed
+    one at a time and joined into a single output string.
     """
 
+    html_pages = iter(html_pages)
+
     # Extract shared <head> from the first page
-    first = html_pages[0]
+    first = next(html_pages)
     head = first.split("<head>")[1].split("</head>")[0]
 
     # Load logo for intro sheet
@@ -622,27 +649,29 @@ def build_combined_html(html_pages, logo_path="files/logos.png"):
     # Build intro sheet
     intro_body = render_intro_page(logo_b64)
 
-    pages = []
-
-    # Add intro page as page 1
-    pages.append(f"<div>{intro_body}</div><div class='page-break'></div>")
+    def _pages():
+        # Add intro page as page 1
+        yield f"<div>{intro_body}</div><div class='page-break'></div>"
 
-    # Add all schedule pages
-    for i, html in enumerate(html_pages):
-        body = html.split("<body>")[1].split("</body>")[0]
-        if i < len(html_pages) - 1:
-            pages.append(f"<div>{body}</div><div class='page-break'></div>")
-        else:
-            pages.append(f"<div>{body}</div>")
+        # Add all schedule pages, page break between each
+        for i, html in enumerate(chain([first], html_pages)):
+            body = html.split("<body>")[1].split("</body>")[0]
+            if i > 0:
+                yield "<div class='page-break'></div>"
+            yield f"<div>{body}</div>"
 
-    return f"""
+    return "".join(chain(
+        [f"""
     <html>
     <head>{head}</head>
     <body>
-        {''.join(pages)}
+        """],
+        _pages(),
+        ["""
     </body>
     </html>
-    """
+    """]
+    ))
 
 
 
@@ -55,7 +55,7 @@ def render_result_view(toggle_choice, supplier_sched, rep_sched):
         st.button("Print ALL rep schedules")
 
 
-
+@st.cache_resource
 def _load_image_base64(image_path):
     with open(image_path, "rb") as img_f:
         return base64.b64encode(img_f.read()).decode()
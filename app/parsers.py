@@ -79,7 +79,7 @@ def parse_meeting_organizer(file_path):
     req_df["Penetration Clean"] = pd.to_numeric(req_df["Penetration Clean"], errors="coerce").fillna(0)
     req_df["Acquisition Clean"] = pd.to_numeric(req_df["Acquisition Clean"], errors="coerce").fillna(0)
 
-    for _, row in req_df.iterrows():
+    for row in req_df.to_dict("records"):
 
         supplier = str(row["Supplier Name"]).strip()
         meeting_num = int(row["Meeting #"])
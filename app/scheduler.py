@@ -1,10 +1,7 @@
 import pandas as pd
 import numpy as np
-import random
 from app.utils import time_slots
 from collections import defaultdict
-import copy
-import numpy as np
 
 ######################################################################
 ####       STEP 1: CLEANING REGIONAL REQUESTS TO REP NAMES        ####
@@ -22,6 +19,17 @@ def is_region_request(att_list):
 def extract_segment(region_name):
     return region_name[:3].upper()
 
+def normalize_rep_regions(reps_df):
+    """
+    Returns a copy of reps_df with Region and Segment upper-cased and stored
+    as categoricals, so the repeated equality filters below compare integer
+    codes instead of re-upper-casing every string on every call.
+    """
+    reps_df = reps_df.copy()
+    for col in ("Region", "Segment"):
+        reps_df[col] = reps_df[col].fillna("").astype(str).str.upper().astype("category")
+    return reps_df
+
 # -----------------------------------------
 # Build region attendee sets
 # -----------------------------------------
@@ -33,8 +41,8 @@ def expand_region_request(att_list, supplier_type, reps_df):
     region = att_list[0].strip()
     segment = extract_segment(region)
 
-    region_df = reps_df[reps_df["Region"].str.upper() == region.upper()]
-    seg_df = reps_df[reps_df["Segment"].str.upper() == segment]
+    region_df = reps_df[reps_df["Region"] == region.upper()]
+    seg_df = reps_df[reps_df["Segment"] == segment]
 
     # ideal roles
     if supplier_type == "Peak":
@@ -57,8 +65,8 @@ def fallback_region(weight, region, segment, reps_df, used):
     region = region.upper()
     segment = segment.upper()
 
-    reg_df = reps_df[reps_df["Region"].str.upper() == region]
-    seg_df = reps_df[reps_df["Segment"].str.upper() == segment]
+    reg_df = reps_df[reps_df["Region"] == region]
+    seg_df = reps_df[reps_df["Segment"] == segment]
 
     # remove used
     reg_df = reg_df[~reg_df["Rep Name"].isin(used)]
@@ -102,14 +110,21 @@ def build_phase1_requested_attendees(preferences, reps_df):
     Returns a new preferences dict with 'requested_attendees' added.
     No scheduling, no timeslots. Only replacing duplicates
     and producing final clean attendee lists.
+    reps_df = output of normalize_rep_regions
     """
 
-    # ensure no missing strings
-    reps_df["Region"] = reps_df["Region"].fillna("").astype(str)
-    reps_df["Segment"] = reps_df["Segment"].fillna("").astype(str)
-
     new_pref = {}
 
+    # Region candidates depend only on (region, supplier type);
+    # expand each combination once instead of once per meeting
+    region_roles = {}
+
+    # Upper-cased name -> canonical "Rep Name" (first match wins)
+    rep_by_name = {}
+    for rep_name in reps_df["Rep Name"]:
+        if isinstance(rep_name, str):
+            rep_by_name.setdefault(rep_name.upper(), rep_name)
+
     for supp, meetings in preferences.items():
         used = set()
         out_meetings = []
@@ -123,7 +138,10 @@ def build_phase1_requested_attendees(preferences, reps_df):
                 region = atts[0]
                 segment = extract_segment(region)
 
-                role_list = expand_region_request(atts, supplier_type, reps_df)
+                role_key = (region.strip().upper(), supplier_type)
+                if role_key not in region_roles:
+                    region_roles[role_key] = expand_region_request(atts, supplier_type, reps_df)
+                role_list = region_roles[role_key]
 
                 resolved = []
 
@@ -152,9 +170,8 @@ def build_phase1_requested_attendees(preferences, reps_df):
                 resolved = []
                 for name in atts:
                     # if the rep exists AND unused:
-                    df_match = reps_df[reps_df["Rep Name"].str.upper() == name.upper()]
-                    if len(df_match) > 0:
-                        rep_name = df_match.iloc[0]["Rep Name"]
+                    rep_name = rep_by_name.get(name.upper())
+                    if rep_name is not None:
                         if rep_name not in used:
                             resolved.append(rep_name)
                             used.add(rep_name)
@@ -182,20 +199,18 @@ def build_phase1_requested_attendees(preferences, reps_df):
 ######################################################################
 
 
-def get_weight(rep_name, reps_df):
-    row = reps_df[reps_df["Rep Name"] == rep_name]
-    if len(row) == 0:
-        return None
-    return int(row.iloc[0]["Weight"])
-
-
-def get_region_segment(rep_name, reps_df):
-    row = reps_df[reps_df["Rep Name"] == rep_name]
-    if len(row) == 0:
-        return None, None
-    region = row.iloc[0]["Region"]
-    segment = row.iloc[0]["Segment"]
-    return region, segment
+def build_rep_lookup(reps_df):
+    """
+    Returns {rep name: (weight, region, segment)} taken from the
+    first row of each rep, so per-rep lookups avoid a table scan.
+    """
+    first = reps_df.drop_duplicates("Rep Name")
+    return {
+        name: (weight, region, segment)
+        for name, weight, region, segment in zip(
+            first["Rep Name"], first["Weight"], first["Region"], first["Segment"]
+        )
+    }
 
 
 def find_replacement(rep_name, rep_weight, reps_df, used_reps, target_region, target_segment):
@@ -204,7 +219,7 @@ def find_replacement(rep_name, rep_weight, reps_df, used_reps, target_region, ta
 
     # W3 → W1 same segment
     if rep_weight == 3:
-        seg_df = df[df["Segment"].str.upper() == target_segment.upper()]
+        seg_df = df[df["Segment"] == target_segment.upper()]
         w1 = seg_df[seg_df["Weight"] == 1]
         if len(w1) > 0:
             return w1.sample(1)["Rep Name"].iloc[0]
@@ -212,7 +227,7 @@ def find_replacement(rep_name, rep_weight, reps_df, used_reps, target_region, ta
 
     # W2 → W1 same region
     if rep_weight == 2:
-        reg_df = df[df["Region"].str.upper() == target_region.upper()]
+        reg_df = df[df["Region"] == target_region.upper()]
         w1 = reg_df[reg_df["Weight"] == 1]
         if len(w1) > 0:
             return w1.sample(1)["Rep Name"].iloc[0]
@@ -220,7 +235,7 @@ def find_replacement(rep_name, rep_weight, reps_df, used_reps, target_region, ta
 
     # W1 → W1 same region
     if rep_weight == 1:
-        reg_df = df[df["Region"].str.upper() == target_region.upper()]
+        reg_df = df[df["Region"] == target_region.upper()]
         w1 = reg_df[reg_df["Weight"] == 1]
         if len(w1) > 0:
             return w1.sample(1)["Rep Name"].iloc[0]
@@ -240,6 +255,8 @@ def build_phase2_cleaned_requests(preferences, reps_df, max_meetings_rep=12):
         rep load summary dict
     """
 
+    reps_df = normalize_rep_regions(reps_df)
+
     preferences_phase1 = build_phase1_requested_attendees(preferences, reps_df)
 
     rep_counts = defaultdict(int)
@@ -250,6 +267,8 @@ def build_phase2_cleaned_requests(preferences, reps_df, max_meetings_rep=12):
 
     starting_counts = dict(rep_counts)
 
+    rep_lookup = build_rep_lookup(reps_df)
+
     suppliers_sorted = []
 
     for supp, meetings in preferences_phase1.items():
@@ -279,13 +298,12 @@ def build_phase2_cleaned_requests(preferences, reps_df, max_meetings_rep=12):
                     used.add(rep)
                     continue
 
-                rep_w = get_weight(rep, reps_df)
-                reg, seg = get_region_segment(rep, reps_df)
-
                 replacement = None
 
-                if rep_w is not None:
-                    replacement = find_replacement(rep, rep_w, reps_df, used, reg, seg)
+                info = rep_lookup.get(rep)
+                if info is not None:
+                    rep_w, reg, seg = info
+                    replacement = find_replacement(rep, int(rep_w), reps_df, used, reg, seg)
 
                 rep_counts[rep] -= 1
                 if rep_counts[rep] < 0:
@@ -307,10 +325,7 @@ def build_phase2_cleaned_requests(preferences, reps_df, max_meetings_rep=12):
         for m in meetings:
 
             # skip region requests
-            if len(m["attendees"]) == 1 and (
-                m["attendees"][0].strip().upper().startswith("KAE")
-                or m["attendees"][0].strip().upper().startswith("SAE")
-            ):
+            if is_region_request(m["attendees"]):
                 continue
 
             original = set(a.strip() for a in m["attendees"])
@@ -343,12 +358,19 @@ def build_validation_report(cleaned_prefs, supplier_schedule, reps_schedule, sup
         "failed_meetings_detail": []
     }
 
+    # Partition the rep schedule once instead of masking it per attendee
+    rep_groups = {}
+    if len(reps_schedule) > 0:
+        rep_groups = dict(tuple(reps_schedule.groupby("rep", sort=False)))
+    no_meetings = reps_schedule.iloc[:0]
+
     # Loop each supplier’s summary
     for supp, summary in sup_summary.items():
 
         requested = summary["requested"]
         fulfilled = summary["fulfilled"]
-        failed = [r for r in requested if r not in fulfilled]
+        fulfilled_set = set(fulfilled)
+        failed = [r for r in requested if r not in fulfilled_set]
 
         supplier_type = cleaned_prefs[supp][0]["supplier_type"]
 
@@ -364,10 +386,15 @@ def build_validation_report(cleaned_prefs, supplier_schedule, reps_schedule, sup
         report["total_failed"] += len(failed)
         report["failed_by_type"][supplier_type] += len(failed)
 
+        # Phase 2 request blocks by name (first block wins, as before)
+        req_blocks = {}
+        for r in cleaned_prefs[supp]:
+            req_blocks.setdefault(r["request_name"], r)
+
         # Build detail for each failed meeting
         for req_name in failed:
             # find the Phase 2 request block
-            req_block = next((r for r in cleaned_prefs[supp] if r["request_name"] == req_name), None)
+            req_block = req_blocks.get(req_name)
 
             if req_block is None:
                 continue
@@ -378,7 +405,7 @@ def build_validation_report(cleaned_prefs, supplier_schedule, reps_schedule, sup
             # pull rep schedules for these reps
             rep_scheds = {}
             for rep in requested_attendees:
-                rep_scheds[rep] = reps_schedule[reps_schedule["rep"] == rep].copy()
+                rep_scheds[rep] = rep_groups.get(rep, no_meetings).copy()
 
             report["failed_meetings_detail"].append({
                 "supplier": supp,
@@ -392,6 +419,16 @@ def build_validation_report(cleaned_prefs, supplier_schedule, reps_schedule, sup
     return report
 
 
+# All usable (day, slot) pairs in schedule order; LUNCH/BREAK excluded.
+# Position i in this tuple is bit i of the availability bitmasks.
+USABLE_SLOTS = tuple(
+    (day, slot)
+    for day, mapping in time_slots.items()
+    for slot, state in mapping.items()
+    if state not in ("LUNCH", "BREAK")
+)
+
+
 def shuffle_timeslots(supplier_df, reps_df, seed=42):
     """
     Shuffle ALL timeslots globally while keeping the meeting assignments identical.
@@ -407,11 +444,7 @@ def shuffle_timeslots(supplier_df, reps_df, seed=42):
     # ----------------------------------------------------
     # 1. Collect all valid timeslots
     # ----------------------------------------------------
-    all_slots = []
-    for day, mapping in time_slots.items():
-        for slot, state in mapping.items():
-            if state not in ("LUNCH", "BREAK"):
-                all_slots.append((day, slot))
+    all_slots = USABLE_SLOTS
 
     # Safety
     if len(all_slots) == 0:
@@ -420,55 +453,56 @@ def shuffle_timeslots(supplier_df, reps_df, seed=42):
     # ----------------------------------------------------
     # 2. Shuffle timeslots
     # ----------------------------------------------------
+    # A permutation of slot indices (same draw as shuffling the list itself)
     rng = np.random.default_rng(seed)
-    shuffled = all_slots.copy()
-    rng.shuffle(shuffled)
+    perm = rng.permutation(len(all_slots))
 
     # Build mapping dict
-    remap = {old: new for old, new in zip(all_slots, shuffled)}
+    remap = {old: all_slots[j] for old, j in zip(all_slots, perm)}
 
     # ----------------------------------------------------
-    # 3. Apply mapping to supplier schedule
+    # 3. Apply mapping to both schedules
     # ----------------------------------------------------
-    supplier_df = supplier_df.copy()
-    supplier_df["day_new"] = supplier_df.apply(
-        lambda r: remap[(r["day"], r["timeslot"])][0],
-        axis=1
-    )
-    supplier_df["timeslot_new"] = supplier_df.apply(
-        lambda r: remap[(r["day"], r["timeslot"])][1],
-        axis=1
-    )
-    supplier_df.drop(columns=["day", "timeslot"], inplace=True)
-    supplier_df.rename(columns={"day_new": "day", "timeslot_new": "timeslot"}, inplace=True)
-
-    # ----------------------------------------------------
-    # 4. Apply mapping to rep schedule
-    # ----------------------------------------------------
-    reps_df = reps_df.copy()
-    reps_df["day_new"] = reps_df.apply(
-        lambda r: remap[(r["day"], r["timeslot"])][0],
-        axis=1
-    )
-    reps_df["timeslot_new"] = reps_df.apply(
-        lambda r: remap[(r["day"], r["timeslot"])][1],
-        axis=1
-    )
-    reps_df.drop(columns=["day", "timeslot"], inplace=True)
-    reps_df.rename(columns={"day_new": "day", "timeslot_new": "timeslot"}, inplace=True)
+    # One dict lookup per row; day/timeslot are re-added as the last columns,
+    # matching the previous drop + rename
+    def apply_remap(df):
+        new_slots = [remap[key] for key in zip(df["day"], df["timeslot"])]
+        return df.drop(columns=["day", "timeslot"]).assign(
+            day=[day for day, _ in new_slots],
+            timeslot=[slot for _, slot in new_slots],
+        )
+
+    supplier_df = apply_remap(supplier_df)
+    reps_df = apply_remap(reps_df)
 
     return supplier_df, reps_df
 
+def supplier_schedule_order(preferences):
+    """
+    Supplier names in scheduling order: Peak suppliers first, then the rest,
+    each group keeping its original order. Depends only on the supplier type
+    of each supplier's first meeting, so it is the same for every seed.
+    """
+
+    def sort_key(supp):
+        first = min(preferences[supp], key=lambda x: x["meeting_number"])
+        return 0 if first["supplier_type"] == "Peak" else 1
+
+    return sorted(preferences.keys(), key=sort_key)
+
+
 def build_phase3_create_schedules(preferences,
                                   reps_df,
                                   max_meetings_rep=12,
                                   max_peak=6,
                                   max_acc=3,
-                                  seed=42):
+                                  seed=42,
+                                  supplier_order=None):
 
     """
     Phase 3: Use Phase 2 cleaned attendee lists and attempt to schedule all meetings,
     then shuffle timeslots globally.
+    supplier_order = precomputed supplier_schedule_order(preferences), if available
     """
 
     # ------------------------------------------------------
@@ -479,49 +513,65 @@ def build_phase3_create_schedules(preferences,
     )
 
     # ------------------------------------------------------
-    # Step 2: Track rep availability
+    # Step 2: Track rep meeting counts
     # ------------------------------------------------------
-    rep_avail = {
-        rep: {
-            day: {slot: (state is None) for slot, state in time_slots[day].items()}
-            for day in time_slots
-        }
-        for rep in reps_df["Rep Name"]
-    }
+    # Dense rep ids (first-seen order) index the per-rep state lists below
+    rep_id = {}
+    for rep in reps_df["Rep Name"]:
+        rep_id.setdefault(rep, len(rep_id))
 
-    rep_meet_count = {rep: 0 for rep in reps_df["Rep Name"]}
+    rep_meet_count = [0] * len(rep_id)
 
-    supplier_rows = []
-    rep_rows = []
+    # Output columns, filled in parallel (one entry per scheduled row)
+    supplier_cols = {
+        "supplier": [], "booth": [], "day": [], "timeslot": [],
+        "reps": [], "category": [], "total_opportunity": [],
+    }
+    rep_cols = {
+        "rep": [], "day": [], "timeslot": [], "supplier": [],
+        "booth": [], "category": [], "total_opportunity": [],
+    }
     sup_summary = {}
 
     # ------------------------------------------------------
     # Step 3: Supplier scheduling order
     # ------------------------------------------------------
-    suppliers = list(cleaned_prefs.keys())
-
-    def sort_key(supp):
-        t = cleaned_prefs[supp][0]["supplier_type"]
-        return 0 if t == "Peak" else 1
+    if supplier_order is None:
+        supplier_order = supplier_schedule_order(cleaned_prefs)
 
-    suppliers = sorted(suppliers, key=sort_key)
+    suppliers = supplier_order
 
     # ------------------------------------------------------
     # Step 4: All usable timeslots
     # ------------------------------------------------------
-    def all_slots():
-        out = []
-        for day, mapping in time_slots.items():
-            for slot, state in mapping.items():
-                if state not in ("LUNCH", "BREAK"):
-                    out.append((day, slot))
-        return out
+    slot_order = USABLE_SLOTS
+    all_slots_mask = (1 << len(slot_order)) - 1
+
+    # Rep availability as one bitmask per rep: bit i is set once the rep
+    # is booked in slot_order[i]
+    rep_busy = [0] * len(rep_id)
 
-    slot_order = all_slots()
+    # Ids of reps that reached max_meetings_rep
+    saturated = set()
 
-    random.seed(seed)
     np.random.seed(seed)
 
+    # Meetings per supplier in meeting_number order, with the fields the
+    # loop reads and attendee names already resolved to rep ids
+    resolved_meetings = {}
+    for supp in suppliers:
+        resolved_meetings[supp] = [
+            (
+                m["request_name"],
+                m["requested_attendees"],
+                [rep_id[rep] for rep in m["requested_attendees"]],
+                m.get("total_opportunity", 0.0),
+                m["request_type"],
+                m["unavailable"] if "unavailable" in m else [],
+            )
+            for m in sorted(cleaned_prefs[supp], key=lambda x: x["meeting_number"])
+        ]
+
     # ------------------------------------------------------
     # Step 5: Scheduling loop
     # ------------------------------------------------------
@@ -542,12 +592,13 @@ def build_phase3_create_schedules(preferences,
 
         used_count = 0
 
-        for m in sorted(meetings, key=lambda x: x["meeting_number"]):
+        # Membership view of sup_summary[supp]["fulfilled"] (which keeps order)
+        fulfilled_set = set()
 
-            req_name = m["request_name"]
-            attendees = m["requested_attendees"]
-            tot_opp = m.get("total_opportunity", 0.0)
-            type = m["request_type"]
+        # Slots this supplier is already booked in (bit i -> slot_order[i])
+        supplier_busy = 0
+
+        for req_name, attendees, attendee_ids, tot_opp, type, subs in resolved_meetings[supp]:
 
             sup_summary[supp]["requested"].append(req_name)
 
@@ -556,91 +607,79 @@ def build_phase3_create_schedules(preferences,
 
             assigned = False
 
-            for day, slot in slot_order:
-
-                supplier_double = any(
-                    r["supplier"] == supp and r["day"] == day and r["timeslot"] == slot
-                    for r in supplier_rows
-                )
-                if supplier_double:
-                    continue
+            # No slot can work while any attendee is at the meeting cap
+            free = 0
+            if saturated.isdisjoint(attendee_ids):
+                busy = supplier_busy
+                for rid in attendee_ids:
+                    busy |= rep_busy[rid]
+                free = all_slots_mask & ~busy
 
-                available = True
-                for rep in attendees:
-                    if rep_meet_count[rep] >= max_meetings_rep:
-                        available = False
-                        break
-                    if not rep_avail[rep][day][slot]:
-                        available = False
-                        break
-                if not available:
-                    continue
+            if free:
+                # Earliest slot free for the supplier and every attendee
+                slot_idx = (free & -free).bit_length() - 1
+                slot_bit = 1 << slot_idx
+                day, slot = slot_order[slot_idx]
 
                 # Assign meeting
                 assigned = True
                 used_count += 1
+                supplier_busy |= slot_bit
                 sup_summary[supp]["fulfilled"].append(req_name)
+                fulfilled_set.add(req_name)
 
                 # Missing names → substitutions
-                subs = m["unavailable"] if "unavailable" in m else []
                 sup_summary[supp]["substitutions"][req_name] = subs
                 sup_summary[supp]["req_types"][req_name] = type
 
                 # --------------------------
                 # Write Supplier schedule row
                 # --------------------------
-                supplier_rows.append({
-                    "supplier": supp,
-                    "booth": booth,
-                    "day": day,
-                    "timeslot": slot,
-                    "reps": attendees,
-                    "category": req_name,
-                    "total_opportunity": tot_opp
-                })
+                supplier_cols["supplier"].append(supp)
+                supplier_cols["booth"].append(booth)
+                supplier_cols["day"].append(day)
+                supplier_cols["timeslot"].append(slot)
+                supplier_cols["reps"].append(attendees)
+                supplier_cols["category"].append(req_name)
+                supplier_cols["total_opportunity"].append(tot_opp)
 
                 # --------------------------
                 # Write Rep schedule rows
                 # --------------------------
                 for rep in attendees:
-                    rep_rows.append({
-                        "rep": rep,
-                        "day": day,
-                        "timeslot": slot,
-                        "supplier": supp,
-                        "booth": booth,
-                        "category": req_name,
-                        "total_opportunity": tot_opp
-                    })
-
-                    rep_avail[rep][day][slot] = False
-                    rep_meet_count[rep] += 1
-
-                break  # stop searching for slots
+                    rep_cols["rep"].append(rep)
+                    rep_cols["day"].append(day)
+                    rep_cols["timeslot"].append(slot)
+                    rep_cols["supplier"].append(supp)
+                    rep_cols["booth"].append(booth)
+                    rep_cols["category"].append(req_name)
+                    rep_cols["total_opportunity"].append(tot_opp)
+
+                for rid in attendee_ids:
+                    rep_busy[rid] |= slot_bit
+                    rep_meet_count[rid] += 1
+                    if rep_meet_count[rid] >= max_meetings_rep:
+                        saturated.add(rid)
 
             if not assigned:
-                sup_summary[supp]["substitutions"][req_name] = \
-                    m["unavailable"] if "unavailable" in m else []
+                sup_summary[supp]["substitutions"][req_name] = subs
 
         if cap > 0:
-            new_requested = []
+            requested = sup_summary[supp]["requested"]
             fulfilled_count = 0
 
-            for req in sup_summary[supp]["requested"]:
-                new_requested.append(req)
-
-                if req in sup_summary[supp]["fulfilled"]:
+            for i, req in enumerate(requested):
+                if req in fulfilled_set:
                     fulfilled_count += 1
 
-                # stop as soon as we have shown *cap* fulfilled meetings
-                if fulfilled_count >= cap:
-                    break
-
-            sup_summary[supp]["requested"] = new_requested
+                    # stop as soon as we have shown *cap* fulfilled meetings
+                    if fulfilled_count >= cap:
+                        sup_summary[supp]["requested"] = requested[:i + 1]
+                        break
 
     # Convert to DataFrames (now with opportunity values)
-    supplier_df = pd.DataFrame(supplier_rows)
-    reps_df_sched = pd.DataFrame(rep_rows)
+    supplier_df = pd.DataFrame(supplier_cols)
+    reps_df_sched = pd.DataFrame(rep_cols)
 
     # ------------------------------------------------------
     # Shuffle timeslots globally
@@ -670,12 +709,16 @@ def run_scheduler(preferences,
                   seeds=100):
     """
     Runs Phase 3 scheduling across many seeds and returns the result
-    from the best-performing seed (least total failures).
+    from the best-performing seed (least total failures). Stops at the
+    first seed with no failures.
     """
 
     results = []
     best_output = None
 
+    # Same for every seed, so sort once
+    supplier_order = supplier_schedule_order(preferences)
+
     for s in range(seeds):
 
         supplier_schedule, reps_schedule, sup_summary, validation = \
@@ -685,7 +728,8 @@ def run_scheduler(preferences,
                 max_meetings_rep=max_meetings_rep,
                 max_peak=max_peak,
                 max_acc=max_acc,
-                seed=s
+                seed=s,
+                supplier_order=supplier_order
             )
 
         fail_peak = validation["failed_by_type"]["Peak"]
@@ -712,6 +756,10 @@ def run_scheduler(preferences,
                 "validation": validation
             }
 
+        # nothing beats zero failures, so the remaining seeds cannot win
+        if fail_total == 0:
+            break
+
     # package as tuple to match Phase 3 return style
     return (
         best_output["supplier_schedule"],